@@ -2,6 +2,10 @@ import streamlit as st
 import pandas as pd
 import folium
 from streamlit_folium import st_folium
+import sqlite3
+
+import sql_aforo
+from datos_aforo import parse_coordinates
 
 # Configuración de la página
 st.set_page_config(
@@ -72,24 +76,6 @@ def create_map(data):
     
     return m
 
-def parse_coordinates(coord_string):
-    """
-    Extrae latitud y longitud de una cadena de coordenadas.
-    
-    Args:
-        coord_string (str): Cadena con formato "latitud, longitud"
-        
-    Returns:
-        tuple: (latitud, longitud) o (None, None) si hay error
-    """
-    try:
-        parts = coord_string.split(',')
-        lat = float(parts[0].strip())
-        lon = float(parts[1].strip())
-        return lat, lon
-    except:
-        return None, None
-
 def load_metadata():
     """
     Carga y procesa el archivo de metadatos.
@@ -117,6 +103,32 @@ def load_metadata():
         st.error(f"Error al cargar los metadatos: {str(e)}")
         return None
 
+def get_summary(data):
+    """
+    Obtiene el número de videos analizados y el periodo de análisis.
+    
+    Usa una consulta agregada sobre la base SQLite indexada; si la base no está
+    disponible, calcula lo mismo con pandas a partir de los metadatos cargados.
+    
+    Args:
+        data (pd.DataFrame): Metadatos con coordenadas válidas
+        
+    Returns:
+        tuple: (total_videos, fecha_min, fecha_max) con las fechas como
+        pd.Timestamp o None si no hay fechas válidas
+    """
+    try:
+        resumen = sql_aforo.resumen_periodo(sql_aforo.base_del_proceso())
+        fecha_min = pd.Timestamp(resumen['inicio']) if resumen['inicio'] is not None else None
+        fecha_max = pd.Timestamp(resumen['fin']) if resumen['fin'] is not None else None
+        return int(resumen['total']), fecha_min, fecha_max
+    except (sqlite3.Error, OSError, ValueError):
+        fechas_inicio = pd.to_datetime(data['Fecha_inicio'], format='%d/%m/%Y %H:%M:%S', errors='coerce')
+        fechas_fin = pd.to_datetime(data['Fecha_fin'], format='%d/%m/%Y %H:%M:%S', errors='coerce')
+        fecha_min = fechas_inicio.min() if not fechas_inicio.isna().all() else None
+        fecha_max = fechas_fin.max() if not fechas_fin.isna().all() else None
+        return data['Duracion_video'].count(), fecha_min, fecha_max
+
 def main():
     """Función principal de la aplicación."""
     
@@ -169,23 +181,18 @@ def main():
         
         col1, col2 = st.columns(2)
         
+        # Número de videos y periodo de análisis (consulta agregada indexada)
+        total_videos, fecha_min, fecha_max = get_summary(data)
+        
         with col1:
             st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            # Calcular duración total de videos
-            total_duration = data['Duracion_video'].count()
-            st.metric("Videos Analizados", total_duration)
+            st.metric("Videos Analizados", total_videos)
             st.markdown('</div>', unsafe_allow_html=True)
         
         with col2:
             st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            # Calcular periodo de análisis
-            fechas_inicio = pd.to_datetime(data['Fecha_inicio'], format='%d/%m/%Y %H:%M:%S', errors='coerce')
-            fechas_fin = pd.to_datetime(data['Fecha_fin'], format='%d/%m/%Y %H:%M:%S', errors='coerce')
-            
-            if not fechas_inicio.isna().all() and not fechas_fin.isna().all():
-                fecha_min = fechas_inicio.min().strftime('%d/%m/%Y')
-                fecha_max = fechas_fin.max().strftime('%d/%m/%Y')
-                st.metric("Periodo de Análisis", f"{fecha_min} - {fecha_max}")
+            if fecha_min is not None and fecha_max is not None:
+                st.metric("Periodo de Análisis", f"{fecha_min.strftime('%d/%m/%Y')} - {fecha_max.strftime('%d/%m/%Y')}")
             else:
                 st.metric("Periodo de Análisis", "N/A")
             st.markdown('</div>', unsafe_allow_html=True)
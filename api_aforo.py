@@ -0,0 +1,301 @@
+"""
+API HTTP de solo lectura con los datos de aforo vehicular.
+
+Expone los mismos datos que las páginas de Streamlit (metadatos de los videos y
+conteos por línea y clase) en formato JSON, para que otros sistemas no tengan
+que leer las páginas ni los botones de descarga.
+
+Uso:
+    python api_aforo.py --puerto 8600
+
+Endpoints (todos GET):
+    /api/videos
+        Lista de videos. Filtros opcionales: bbox, desde, hasta.
+    /api/videos/<nombre>/conteos
+        Conteos del video por línea y clase. Filtros opcionales: linea, clase.
+    /api/agregados
+        Suma de conteos de los videos filtrados. Parámetros opcionales: bbox,
+        desde, hasta y agrupar (clase, linea o video). Solo se suman los videos
+        cuyo archivo de conteos coincide exactamente con su nombre; los que
+        solo tienen coincidencia aproximada se listan aparte.
+
+Parámetros comunes:
+    bbox        lon_min,lat_min,lon_max,lat_max
+    desde/hasta fecha ISO en hora local y sin zona horaria (2025-06-30 o
+                2025-06-30T07:00:00); se incluyen los videos cuyo periodo se
+                traslapa con el intervalo
+    pagina      número de página (desde 1)
+    por_pagina  resultados por página (máximo 1000)
+
+Las respuestas llevan ETag (Tornado responde 304 ante If-None-Match) y se
+comprimen con gzip cuando el cliente lo acepta. Las conexiones HTTP/1.1 se
+mantienen abiertas entre peticiones.
+"""
+import argparse
+import json
+import os
+
+import pandas as pd
+import tornado.ioloop
+import tornado.web
+
+from datos_aforo import (
+    CARPETA_DATOS,
+    agregar_ubicacion_y_fechas,
+    leer_metadatos,
+    procesar_conteos,
+    resolver_archivo_conteos,
+    tabla_conteos,
+)
+
+COLUMNA_VIDEO = 'Nombre_archivo'
+POR_PAGINA_DEFECTO = 100
+POR_PAGINA_MAXIMO = 1000
+AGRUPACIONES = {
+    'clase': ['class'],
+    'linea': ['line_id', 'class'],
+    'video': ['video', 'class'],
+}
+
+
+class Catalogo:
+    """Metadatos y conteos cargados una sola vez por proceso"""
+
+    def __init__(self, carpeta_datos=CARPETA_DATOS):
+        self.carpeta_datos = carpeta_datos
+        self.ruta_metadatos = os.path.join(carpeta_datos, "Metadatos.csv")
+        self._metadatos = None
+        self._mtime = None
+        self._conteos = {}
+
+    def metadatos(self):
+        """Metadatos con latitud, longitud, inicio y fin; se recargan si cambia el CSV"""
+        mtime = os.path.getmtime(self.ruta_metadatos)
+        if self._metadatos is None or mtime != self._mtime:
+            self._metadatos = agregar_ubicacion_y_fechas(leer_metadatos(self.ruta_metadatos))
+            self._mtime = mtime
+            self._conteos.clear()
+        return self._metadatos
+
+    def conteos(self, nombre_video):
+        """
+        Líneas 1 y 2 del video en un solo DataFrame (como en procesar_conteos).
+
+        Returns:
+            tuple: (conteos, nombre_archivo, aproximado) donde aproximado indica
+            que el archivo se encontró por coincidencia flexible del nombre
+        """
+        if nombre_video not in self._conteos:
+            nombre_archivo, ruta_completa, aproximado = resolver_archivo_conteos(
+                nombre_video, self.carpeta_datos
+            )
+            try:
+                linea_1, linea_2, _ = procesar_conteos(tabla_conteos(ruta_completa).to_pandas())
+                conteos = pd.concat([linea_1, linea_2], ignore_index=True)
+                self._conteos[nombre_video] = (conteos, nombre_archivo, aproximado)
+            except FileNotFoundError:
+                # También se recuerdan los videos sin conteos para no buscarlos en disco cada vez
+                self._conteos[nombre_video] = None
+        if self._conteos[nombre_video] is None:
+            raise FileNotFoundError(nombre_video)
+        return self._conteos[nombre_video]
+
+
+def _registros(df):
+    """Convierte un DataFrame en lista de diccionarios serializables (NaN -> null)"""
+    return df.astype(object).where(df.notna(), None).to_dict(orient='records')
+
+
+class BaseHandler(tornado.web.RequestHandler):
+    """Utilidades comunes: respuesta JSON, errores, filtros y paginación"""
+
+    def initialize(self, catalogo):
+        self.catalogo = catalogo
+
+    def set_default_headers(self):
+        self.set_header('Content-Type', 'application/json; charset=utf-8')
+        # Los clientes pueden guardar la respuesta pero deben revalidarla con el ETag
+        self.set_header('Cache-Control', 'no-cache')
+
+    def responder(self, datos):
+        self.finish(json.dumps(datos, ensure_ascii=False, default=str))
+
+    def write_error(self, status_code, **kwargs):
+        self.finish(json.dumps({'error': self._reason}, ensure_ascii=False))
+
+    def _fecha(self, nombre):
+        valor = self.get_query_argument(nombre, None)
+        if valor is None:
+            return None
+        try:
+            fecha = pd.Timestamp(valor)
+        except ValueError:
+            fecha = pd.NaT
+        if pd.isna(fecha):
+            raise tornado.web.HTTPError(400, reason=f"Fecha inválida en '{nombre}': {valor}")
+        if fecha.tzinfo is not None:
+            # Las fechas de los metadatos son hora local sin zona horaria
+            raise tornado.web.HTTPError(
+                400, reason=f"'{nombre}' no debe incluir zona horaria (se usa la hora local de los videos)"
+            )
+        return fecha
+
+    def _bbox(self):
+        valor = self.get_query_argument('bbox', None)
+        if valor is None:
+            return None
+        try:
+            lon_min, lat_min, lon_max, lat_max = [float(v) for v in valor.split(',')]
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason="bbox debe ser lon_min,lat_min,lon_max,lat_max")
+        return lon_min, lat_min, lon_max, lat_max
+
+    def videos_filtrados(self):
+        """Metadatos filtrados por bbox y por periodo según la query string"""
+        df = self.catalogo.metadatos()
+        bbox = self._bbox()
+        desde = self._fecha('desde')
+        hasta = self._fecha('hasta')
+
+        if bbox is not None:
+            lon_min, lat_min, lon_max, lat_max = bbox
+            df = df[df['longitud'].between(lon_min, lon_max) & df['latitud'].between(lat_min, lat_max)]
+        if desde is not None:
+            df = df[df['fin'] >= desde]
+        if hasta is not None:
+            df = df[df['inicio'] <= hasta]
+        return df
+
+    def paginar(self, registros):
+        """Devuelve la página solicitada junto con el total de resultados"""
+        try:
+            pagina = int(self.get_query_argument('pagina', 1))
+            por_pagina = int(self.get_query_argument('por_pagina', POR_PAGINA_DEFECTO))
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason="pagina y por_pagina deben ser enteros")
+        if pagina < 1 or not 1 <= por_pagina <= POR_PAGINA_MAXIMO:
+            raise tornado.web.HTTPError(
+                400, reason=f"pagina >= 1 y 1 <= por_pagina <= {POR_PAGINA_MAXIMO}"
+            )
+
+        inicio = (pagina - 1) * por_pagina
+        return {
+            'total': len(registros),
+            'pagina': pagina,
+            'por_pagina': por_pagina,
+            'resultados': registros[inicio:inicio + por_pagina],
+        }
+
+
+class VideosHandler(BaseHandler):
+    """GET /api/videos"""
+
+    def get(self):
+        df = self.videos_filtrados().drop(columns=['inicio', 'fin'])
+        self.responder(self.paginar(_registros(df)))
+
+
+class ConteosVideoHandler(BaseHandler):
+    """GET /api/videos/<nombre>/conteos"""
+
+    def get(self, nombre_video):
+        if nombre_video not in set(self.catalogo.metadatos()[COLUMNA_VIDEO]):
+            raise tornado.web.HTTPError(404, reason=f"Video no encontrado: {nombre_video}")
+        try:
+            conteos, nombre_archivo, aproximado = self.catalogo.conteos(nombre_video)
+        except FileNotFoundError:
+            raise tornado.web.HTTPError(404, reason=f"No hay conteos para: {nombre_video}")
+
+        linea = self.get_query_argument('linea', None)
+        clase = self.get_query_argument('clase', None)
+        if linea is not None:
+            conteos = conteos[conteos['line_id'].astype(str) == linea]
+        if clase is not None:
+            conteos = conteos[conteos['class'] == clase]
+
+        totales = conteos.groupby('class', as_index=False)['count'].sum()
+        self.responder({
+            'video': nombre_video,
+            'archivo': nombre_archivo,
+            'coincidencia_aproximada': aproximado,
+            'total': int(conteos['count'].sum()),
+            'por_clase': _registros(totales),
+            'por_linea': _registros(conteos[['line_id', 'class', 'count']]),
+        })
+
+
+class AgregadosHandler(BaseHandler):
+    """GET /api/agregados"""
+
+    def get(self):
+        agrupar = self.get_query_argument('agrupar', 'clase')
+        if agrupar not in AGRUPACIONES:
+            raise tornado.web.HTTPError(
+                400, reason=f"agrupar debe ser uno de: {', '.join(AGRUPACIONES)}"
+            )
+
+        videos = self.videos_filtrados()[COLUMNA_VIDEO].tolist()
+        partes = []
+        sin_conteos = []
+        aproximados = []
+        for video in videos:
+            try:
+                conteos, nombre_archivo, aproximado = self.catalogo.conteos(video)
+            except FileNotFoundError:
+                sin_conteos.append(video)
+                continue
+            # Solo se suman coincidencias exactas: una coincidencia flexible puede
+            # apuntar al archivo de otro video y duplicaría sus conteos
+            if aproximado:
+                aproximados.append({'video': video, 'archivo': nombre_archivo})
+                continue
+            partes.append(conteos.assign(video=video))
+
+        if partes:
+            conteos = pd.concat(partes, ignore_index=True)
+            agregados = conteos.groupby(AGRUPACIONES[agrupar], as_index=False)['count'].sum()
+            total = int(conteos['count'].sum())
+        else:
+            agregados = pd.DataFrame(columns=AGRUPACIONES[agrupar] + ['count'])
+            total = 0
+
+        respuesta = self.paginar(_registros(agregados))
+        respuesta.update({
+            'videos': len(partes),
+            'videos_sin_conteos': sin_conteos,
+            'videos_coincidencia_aproximada': aproximados,
+            'total_conteo': total,
+        })
+        self.responder(respuesta)
+
+
+def crear_app(carpeta_datos=CARPETA_DATOS):
+    """Crea la aplicación Tornado con un catálogo compartido por todos los handlers"""
+    catalogo = Catalogo(carpeta_datos)
+    argumentos = {'catalogo': catalogo}
+    return tornado.web.Application(
+        [
+            (r"/api/videos", VideosHandler, argumentos),
+            (r"/api/videos/([^/]+)/conteos", ConteosVideoHandler, argumentos),
+            (r"/api/agregados", AgregadosHandler, argumentos),
+        ],
+        compress_response=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API JSON de aforo vehicular")
+    parser.add_argument("--puerto", type=int, default=8600)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--datos", default=CARPETA_DATOS, help="Carpeta con Metadatos.csv y los conteos")
+    args = parser.parse_args()
+
+    app = crear_app(args.datos)
+    # Conexiones keep-alive inactivas se cierran después de 60 s
+    app.listen(args.puerto, address=args.host, idle_connection_timeout=60)
+    print(f"API de aforo escuchando en http://{args.host}:{args.puerto}/api/videos")
+    tornado.ioloop.IOLoop.current().start()
+
+
+if __name__ == "__main__":
+    main()
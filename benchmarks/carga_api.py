@@ -0,0 +1,120 @@
+"""
+Prueba de carga para la API JSON de aforo (api_aforo.py).
+
+Cada cliente usa una conexión HTTP/1.1 persistente (keep-alive) y recorre las
+rutas indicadas durante el tiempo solicitado. Al final se reporta la latencia
+p50/p99 y las peticiones por segundo.
+
+Uso (con la API corriendo en otra terminal):
+    python api_aforo.py --puerto 8600
+    python benchmarks/carga_api.py --url http://127.0.0.1:8600 --clientes 16 --duracion 20
+"""
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) de una lista de valores"""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+def rutas_por_defecto(url_base):
+    """Rutas representativas: lista de videos, conteos por video y agregados"""
+    with urllib.request.urlopen(f"{url_base}/api/videos?por_pagina=1000") as respuesta:
+        videos = [v['Nombre_archivo'] for v in json.load(respuesta)['resultados']]
+    rutas = ["/api/videos", "/api/agregados", "/api/agregados?agrupar=linea"]
+    for video in videos:
+        ruta = f"/api/videos/{urllib.parse.quote(video)}/conteos"
+        # Solo se incluyen los videos que tienen archivo de conteos (los demás dan 404)
+        try:
+            urllib.request.urlopen(f"{url_base}{ruta}").close()
+        except urllib.error.HTTPError:
+            continue
+        rutas.append(ruta)
+    return rutas
+
+
+def cliente(host, puerto, rutas, fin, usar_etag, latencias, errores, candado):
+    """Envía peticiones en bucle sobre una sola conexión hasta el instante fin"""
+    conexion = http.client.HTTPConnection(host, puerto, timeout=30)
+    etags = {}
+    propias = []
+    fallos = 0
+    i = 0
+    while time.perf_counter() < fin:
+        ruta = rutas[i % len(rutas)]
+        i += 1
+        encabezados = {'Accept-Encoding': 'gzip'}
+        if usar_etag and ruta in etags:
+            encabezados['If-None-Match'] = etags[ruta]
+        inicio = time.perf_counter()
+        try:
+            conexion.request('GET', ruta, headers=encabezados)
+            respuesta = conexion.getresponse()
+            respuesta.read()
+        except (OSError, http.client.HTTPException):
+            fallos += 1
+            conexion.close()
+            conexion = http.client.HTTPConnection(host, puerto, timeout=30)
+            continue
+        propias.append(time.perf_counter() - inicio)
+        if respuesta.status not in (200, 304):
+            fallos += 1
+        elif respuesta.getheader('ETag'):
+            etags[ruta] = respuesta.getheader('ETag')
+    conexion.close()
+    with candado:
+        latencias.extend(propias)
+        errores.append(fallos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API de aforo")
+    parser.add_argument("--url", default="http://127.0.0.1:8600")
+    parser.add_argument("--clientes", type=int, default=16, help="Conexiones concurrentes")
+    parser.add_argument("--duracion", type=float, default=20, help="Segundos de prueba")
+    parser.add_argument("--etag", action="store_true", help="Reenviar If-None-Match (respuestas 304)")
+    args = parser.parse_args()
+
+    url = urllib.parse.urlparse(args.url)
+    rutas = rutas_por_defecto(args.url.rstrip('/'))
+
+    latencias, errores = [], []
+    candado = threading.Lock()
+    inicio = time.perf_counter()
+    fin = inicio + args.duracion
+    hilos = [
+        threading.Thread(
+            target=cliente,
+            args=(url.hostname, url.port or 80, rutas, fin, args.etag, latencias, errores, candado),
+        )
+        for _ in range(args.clientes)
+    ]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    transcurrido = time.perf_counter() - inicio
+
+    print(f"Rutas: {len(rutas)} | Clientes: {args.clientes} | Duración: {transcurrido:.1f} s")
+    print(f"Peticiones: {len(latencias)} | Errores: {sum(errores)}")
+    print(f"Peticiones/s: {len(latencias) / transcurrido:.1f}")
+    if latencias:
+        print(f"Latencia media: {statistics.mean(latencias) * 1000:.2f} ms")
+    print(f"Latencia p50: {percentil(latencias, 50) * 1000:.2f} ms")
+    print(f"Latencia p99: {percentil(latencias, 99) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
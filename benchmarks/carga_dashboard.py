@@ -0,0 +1,365 @@
+"""
+Prueba de carga con sesiones concurrentes contra el dashboard de Streamlit.
+
+Levanta un servidor local de Streamlit con ``Dashboard_aforo_vehicular.py`` (o usa
+uno existente con --url) y abre N sesiones concurrentes mediante el mismo
+protocolo websocket que usa el navegador. Cada sesión abre el dashboard y el
+reporte, y luego alterna entre cambiar de video en el selector del reporte y
+navegar entre páginas. Se registra la latencia de cada rerun (desde que se envía
+la petición hasta que el servidor indica que terminó el script) y se muestrea el
+CPU y la memoria residente (RSS) del servidor.
+
+Las pestañas (st.tabs) se cambian en el navegador sin rerun, por lo que no
+generan carga en el servidor y no se simulan.
+
+Uso:
+    python benchmarks/carga_dashboard.py --sesiones 30 --acciones 20 --salida resultados.json
+    python benchmarks/carga_dashboard.py --comparar base.json nuevo.json
+
+Los resultados en JSON incluyen el commit y los parámetros usados, para poder
+comparar ejecuciones entre commits.
+
+Por defecto una sesión de calentamiento recorre la app antes de medir, para que
+las latencias no incluyan la primera carga de datos. Con --sin-calentamiento
+las sesiones concurrentes llegan a un servidor en frío y compiten por construir
+las cachés (borrar antes datos/.arrow y datos/aforo.sqlite para incluir también
+su generación), que es donde aparecen las condiciones de carrera de arranque.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+import psutil
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from tornado.websocket import websocket_connect
+
+from carga_api import percentil
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT_PRINCIPAL = "Dashboard_aforo_vehicular.py"
+PAGINA_REPORTE = "Reporte"
+ETIQUETA_SELECTOR = "Selecciona un video:"
+
+
+class SesionStreamlit:
+    """Cliente websocket mínimo que ejecuta reruns como lo haría el navegador"""
+
+    def __init__(self, conexion):
+        self.conexion = conexion
+        self.paginas = {}
+        self.selector_id = None
+        self.videos = []
+        self.errores = 0
+
+    @classmethod
+    async def abrir(cls, url_ws):
+        conexion = await websocket_connect(url_ws, subprotocols=["streamlit"], max_message_size=256 * 1024 * 1024)
+        return cls(conexion)
+
+    async def rerun(self, pagina="", widgets=None):
+        """
+        Pide un rerun de la página indicada y espera a que el script termine.
+
+        Args:
+            pagina (str): page_script_hash de la página ("" para la principal)
+            widgets (list, opcional): Tuplas (id, valor) de widgets de texto
+
+        Returns:
+            float: Segundos transcurridos hasta recibir script_finished
+        """
+        mensaje = BackMsg()
+        mensaje.rerun_script.query_string = ""
+        mensaje.rerun_script.page_script_hash = pagina
+        for widget_id, valor in widgets or []:
+            mensaje.rerun_script.widget_states.widgets.add(id=widget_id, string_value=valor)
+
+        inicio = time.perf_counter()
+        await self.conexion.write_message(mensaje.SerializeToString(), binary=True)
+        while True:
+            datos = await self.conexion.read_message()
+            if datos is None:
+                raise ConnectionError("El servidor cerró la conexión")
+            recibido = ForwardMsg()
+            recibido.ParseFromString(datos)
+            tipo = recibido.WhichOneof('type')
+
+            if tipo == 'navigation':
+                for pagina_app in recibido.navigation.app_pages:
+                    self.paginas[pagina_app.page_name] = pagina_app.page_script_hash
+            elif tipo == 'delta':
+                elemento = recibido.delta.new_element
+                tipo_elemento = elemento.WhichOneof('type')
+                if tipo_elemento == 'exception':
+                    self.errores += 1
+                elif tipo_elemento == 'selectbox' and elemento.selectbox.label == ETIQUETA_SELECTOR:
+                    self.selector_id = elemento.selectbox.id
+                    self.videos = list(elemento.selectbox.options)
+            elif tipo == 'script_finished':
+                if recibido.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    continue
+                if recibido.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    self.errores += 1
+                return time.perf_counter() - inicio
+
+    def cerrar(self):
+        self.conexion.close()
+
+
+async def ejecutar_sesion(url_ws, acciones, pausa, semilla, latencias, errores):
+    """Escenario de una sesión: dashboard, reporte y después acciones aleatorias"""
+    rng = random.Random(semilla)
+    try:
+        sesion = await SesionStreamlit.abrir(url_ws)
+    except OSError:
+        errores.append('conexion')
+        return
+
+    try:
+        latencias['dashboard'].append(await sesion.rerun())
+        reporte = sesion.paginas.get(PAGINA_REPORTE, "")
+        latencias['reporte'].append(await sesion.rerun(reporte))
+
+        for _ in range(acciones):
+            await asyncio.sleep(rng.uniform(0, 2 * pausa))
+            eleccion = rng.random()
+            if eleccion < 0.7 and sesion.selector_id and sesion.videos:
+                video = rng.choice(sesion.videos)
+                latencias['cambio_video'].append(
+                    await sesion.rerun(reporte, [(sesion.selector_id, video)])
+                )
+            elif eleccion < 0.85:
+                latencias['dashboard'].append(await sesion.rerun())
+            else:
+                latencias['reporte'].append(await sesion.rerun(reporte))
+    except (ConnectionError, OSError):
+        errores.append('desconexion')
+    finally:
+        errores.extend(['script'] * sesion.errores)
+        sesion.cerrar()
+
+
+async def muestrear_servidor(proceso, muestras, detener, intervalo=0.5):
+    """Guarda CPU (%) y RSS (MB) del servidor y sus subprocesos hasta que se pida detener"""
+    def procesos():
+        try:
+            return [proceso] + proceso.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return []
+
+    for p in procesos():
+        p.cpu_percent(None)
+    while not detener.is_set():
+        await asyncio.sleep(intervalo)
+        cpu = rss = 0.0
+        for p in procesos():
+            try:
+                cpu += p.cpu_percent(None)
+                rss += p.memory_info().rss / (1024 * 1024)
+            except psutil.NoSuchProcess:
+                pass
+        muestras.append((cpu, rss))
+
+
+async def prueba(args, url_ws, proceso):
+    """Calienta el servidor con una sesión (salvo --sin-calentamiento) y lanza las sesiones concurrentes"""
+    if not args.sin_calentamiento:
+        await ejecutar_sesion(url_ws, 0, 0, -1, {'dashboard': [], 'reporte': [], 'cambio_video': []}, [])
+
+    latencias = {'dashboard': [], 'reporte': [], 'cambio_video': []}
+    errores = []
+    muestras = []
+    detener = asyncio.Event()
+    monitor = None
+    if proceso is not None:
+        monitor = asyncio.create_task(muestrear_servidor(proceso, muestras, detener))
+
+    async def sesion_escalonada(i):
+        await asyncio.sleep(args.rampa * i / max(args.sesiones, 1))
+        await ejecutar_sesion(url_ws, args.acciones, args.pausa, args.semilla + i, latencias, errores)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(sesion_escalonada(i) for i in range(args.sesiones)))
+    duracion = time.perf_counter() - inicio
+    detener.set()
+    if monitor is not None:
+        await monitor
+    return latencias, errores, muestras, duracion
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def iniciar_servidor(puerto):
+    """Levanta Streamlit en modo headless y espera a que responda el health check"""
+    proceso = subprocess.Popen(
+        [
+            sys.executable, "-m", "streamlit", "run", SCRIPT_PRINCIPAL,
+            "--server.headless", "true",
+            "--server.port", str(puerto),
+            "--server.fileWatcherType", "none",
+            "--browser.gatherUsageStats", "false",
+        ],
+        cwd=RAIZ,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    limite = time.time() + 60
+    while time.time() < limite:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{puerto}/_stcore/health", timeout=1):
+                return proceso
+        except OSError:
+            time.sleep(0.5)
+    proceso.terminate()
+    raise RuntimeError("El servidor de Streamlit no respondió en 60 s")
+
+
+def commit_actual():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocido"
+
+
+def resumir(latencias, errores, muestras, duracion, args):
+    """Resultados en un diccionario serializable a JSON"""
+    resumen_latencias = {}
+    todas = []
+    for accion, valores in list(latencias.items()) + [('todas', None)]:
+        valores = todas if valores is None else valores
+        if accion != 'todas':
+            todas.extend(valores)
+        resumen_latencias[accion] = {
+            'reruns': len(valores),
+            'p50_ms': round(percentil(valores, 50) * 1000, 1),
+            'p90_ms': round(percentil(valores, 90) * 1000, 1),
+            'p99_ms': round(percentil(valores, 99) * 1000, 1),
+            'max_ms': round(max(valores, default=0) * 1000, 1),
+        }
+    cpu = [c for c, _ in muestras]
+    rss = [r for _, r in muestras]
+    return {
+        'commit': commit_actual(),
+        'fecha': datetime.datetime.now().isoformat(timespec='seconds'),
+        'parametros': {
+            'sesiones': args.sesiones,
+            'acciones': args.acciones,
+            'pausa': args.pausa,
+            'rampa': args.rampa,
+            'semilla': args.semilla,
+            'calentamiento': not args.sin_calentamiento,
+        },
+        'duracion_s': round(duracion, 1),
+        'reruns_por_s': round(len(todas) / duracion, 1) if duracion else 0,
+        'errores': len(errores),
+        'latencia': resumen_latencias,
+        'servidor': {
+            'cpu_media_pct': round(statistics.mean(cpu), 1) if cpu else None,
+            'cpu_max_pct': round(max(cpu), 1) if cpu else None,
+            'rss_inicial_mb': round(rss[0], 1) if rss else None,
+            'rss_max_mb': round(max(rss), 1) if rss else None,
+        },
+    }
+
+
+def imprimir(resultado):
+    print(f"Commit: {resultado['commit']} | Sesiones: {resultado['parametros']['sesiones']} "
+          f"| Duración: {resultado['duracion_s']} s | Reruns/s: {resultado['reruns_por_s']} "
+          f"| Errores: {resultado['errores']}")
+    print(f"{'Acción':<15}{'reruns':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for accion, datos in resultado['latencia'].items():
+        print(f"{accion:<15}{datos['reruns']:>8}{datos['p50_ms']:>10}{datos['p90_ms']:>10}"
+              f"{datos['p99_ms']:>10}{datos['max_ms']:>10}")
+    servidor = resultado['servidor']
+    print(f"CPU servidor: media {servidor['cpu_media_pct']}% | máx {servidor['cpu_max_pct']}%")
+    print(f"RSS servidor: inicial {servidor['rss_inicial_mb']} MB | máx {servidor['rss_max_mb']} MB")
+
+
+def comparar(ruta_base, ruta_nuevo):
+    """Imprime las diferencias de latencia y recursos entre dos archivos de resultados"""
+    with open(ruta_base, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(ruta_nuevo, encoding='utf-8') as f:
+        nuevo = json.load(f)
+    if base['parametros'] != nuevo['parametros']:
+        print("Advertencia: las ejecuciones usaron parámetros distintos")
+    print(f"{'Métrica':<28}{base['commit']:>12}{nuevo['commit']:>12}{'cambio':>10}")
+
+    def fila(nombre, a, b):
+        if a is None or b is None:
+            return
+        cambio = f"{(b - a) / a * 100:+.0f}%" if a else "-"
+        print(f"{nombre:<28}{a:>12}{b:>12}{cambio:>10}")
+
+    for accion in nuevo['latencia']:
+        if accion in base['latencia']:
+            for p in ('p50_ms', 'p99_ms'):
+                fila(f"{accion} {p}", base['latencia'][accion][p], nuevo['latencia'][accion][p])
+    fila("reruns_por_s", base['reruns_por_s'], nuevo['reruns_por_s'])
+    for clave in ('cpu_media_pct', 'rss_max_mb'):
+        fila(clave, base['servidor'][clave], nuevo['servidor'][clave])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del dashboard de aforo")
+    parser.add_argument("--sesiones", type=int, default=30, help="Sesiones concurrentes")
+    parser.add_argument("--acciones", type=int, default=20, help="Acciones por sesión")
+    parser.add_argument("--pausa", type=float, default=0.5, help="Pausa media entre acciones (s)")
+    parser.add_argument("--rampa", type=float, default=5, help="Segundos para abrir todas las sesiones")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--sin-calentamiento", action="store_true",
+                        help="No abrir una sesión previa: medir el arranque en frío con sesiones concurrentes")
+    parser.add_argument("--url", help="Servidor existente (por defecto se levanta uno local)")
+    parser.add_argument("--pid", type=int, help="PID del servidor existente para medir CPU y RSS")
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NUEVO"),
+                        help="Compara dos archivos de resultados y termina")
+    args = parser.parse_args()
+
+    if args.comparar:
+        comparar(*args.comparar)
+        return
+
+    servidor = None
+    if args.url:
+        url = args.url.rstrip('/')
+        proceso = psutil.Process(args.pid) if args.pid else None
+    else:
+        puerto = puerto_libre()
+        servidor = iniciar_servidor(puerto)
+        url = f"http://127.0.0.1:{puerto}"
+        proceso = psutil.Process(servidor.pid)
+    url_ws = url.replace("http", "ws", 1) + "/_stcore/stream"
+
+    try:
+        latencias, errores, muestras, duracion = asyncio.run(prueba(args, url_ws, proceso))
+    finally:
+        if servidor is not None:
+            servidor.terminate()
+            servidor.wait(timeout=30)
+
+    resultado = resumir(latencias, errores, muestras, duracion, args)
+    imprimir(resultado)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        print(f"Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Compara búsquedas puntuales y agregaciones: filtros de pandas vs. SQLite indexado.
+
+Genera datos sintéticos (por defecto 100,000 videos con 2 líneas y 6 clases cada
+uno), construye la base con ``sql_aforo.construir_base`` en una carpeta temporal
+y mide la mediana de cada operación con ambos caminos.
+
+Uso:
+    python benchmarks/consultas_sql.py --videos 100000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import sql_aforo  # noqa: E402
+from datos_aforo import agregar_ubicacion_y_fechas  # noqa: E402
+
+CLASES = ['car', 'truck', 'bus', 'person', 'bicycle', 'motorbike']
+
+
+def generar_datos(n_videos, semilla=0):
+    """Metadatos y conteos sintéticos con el mismo formato que los CSV reales"""
+    rng = np.random.default_rng(semilla)
+    nombres = [f"video_{i:06d}.avi" for i in range(n_videos)]
+    inicio = pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 365 * 24 * 2, n_videos) * 30, unit='min')
+    fin = inicio + pd.Timedelta(minutes=30)
+    latitud = rng.uniform(21.05, 21.20, n_videos)
+    longitud = rng.uniform(-86.98, -86.80, n_videos)
+    metadatos = pd.DataFrame({
+        'Nombre_archivo': nombres,
+        'Duracion_video': '29:59:00',
+        'Fecha_inicio': inicio.strftime('%d/%m/%Y %H:%M:%S'),
+        'Fecha_fin': fin.strftime('%d/%m/%Y %H:%M:%S'),
+        'Coordenadas': [f"{lat:.6f}, {lon:.6f}" for lat, lon in zip(latitud, longitud)],
+        'Comentarios': 'Video sintético',
+    })
+    filas = n_videos * 2 * len(CLASES)
+    conteos = pd.DataFrame({
+        'video': np.repeat(nombres, 2 * len(CLASES)),
+        'line_id': np.tile(np.repeat([1, 2], len(CLASES)), n_videos),
+        'class': np.tile(CLASES * 2, n_videos),
+        'count': rng.integers(0, 300, filas),
+    })
+    return metadatos, conteos
+
+
+def medir(funcion, repeticiones):
+    """Mediana en milisegundos de varias ejecuciones de funcion"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pandas vs. SQLite")
+    parser.add_argument("--videos", type=int, default=100_000)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    metadatos, conteos = generar_datos(args.videos)
+    videos = agregar_ubicacion_y_fechas(metadatos)
+    rng = np.random.default_rng(1)
+    muestra = list(rng.choice(metadatos['Nombre_archivo'], args.repeticiones))
+    siguiente = iter(muestra * 10)
+    desde, hasta = pd.Timestamp('2025-06-01'), pd.Timestamp('2025-06-30 23:59:59')
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_bd = os.path.join(carpeta, "aforo.sqlite")
+        inicio = time.perf_counter()
+        sql_aforo.construir_base(ruta_bd, metadatos, conteos)
+        print(f"Videos: {args.videos:,} | Filas de conteos: {len(conteos):,}")
+        print(f"Construcción de la base: {time.perf_counter() - inicio:.1f} s\n")
+
+        pruebas = {
+            "Metadatos de un video": (
+                lambda: metadatos[metadatos['Nombre_archivo'] == next(siguiente)].iloc[0],
+                lambda: sql_aforo.info_video(next(siguiente), ruta_bd),
+            ),
+            "Conteos de un video": (
+                lambda: conteos[conteos['video'] == next(siguiente)],
+                lambda: sql_aforo.conteos_video(next(siguiente), ruta_bd),
+            ),
+            "Totales por clase (group-by global)": (
+                lambda: conteos.groupby('class', as_index=False)['count'].sum(),
+                lambda: sql_aforo.consultar(
+                    'SELECT "class", SUM("count") AS "count" FROM conteos GROUP BY "class"',
+                    ruta_bd=ruta_bd,
+                ),
+            ),
+            "Autos por video en junio (filtro + join + group-by)": (
+                lambda: conteos[
+                    conteos['video'].isin(
+                        videos.loc[(videos['inicio'] >= desde) & (videos['fin'] <= hasta), 'Nombre_archivo']
+                    ) & (conteos['class'] == 'car')
+                ].groupby('video', as_index=False)['count'].sum(),
+                lambda: sql_aforo.consultar(
+                    'SELECT c.video, SUM(c."count") AS "count" FROM videos v '
+                    'JOIN conteos c ON c.video = v.Nombre_archivo '
+                    'WHERE v.inicio >= ? AND v.fin <= ? AND c."class" = ? GROUP BY c.video',
+                    (desde.strftime(sql_aforo.FORMATO_ISO), hasta.strftime(sql_aforo.FORMATO_ISO), 'car'),
+                    ruta_bd,
+                ),
+            ),
+        }
+
+        print(f"{'Operación':<55}{'pandas (ms)':>14}{'SQLite (ms)':>14}")
+        for nombre, (con_pandas, con_sql) in pruebas.items():
+            ms_pandas = medir(con_pandas, args.repeticiones)
+            ms_sql = medir(con_sql, args.repeticiones)
+            print(f"{nombre:<55}{ms_pandas:>14.2f}{ms_sql:>14.2f}")
+
+        sql_aforo.cerrar_conexiones()
+
+
+if __name__ == "__main__":
+    main()
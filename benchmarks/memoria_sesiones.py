@@ -0,0 +1,71 @@
+"""
+Mide la memoria residente (RSS) que agrega cada sesión de la página de reporte.
+
+Abre N sesiones simuladas de ``pages/1_Reporte.py`` con ``streamlit.testing``
+(todas en el mismo proceso, como ocurre en un servidor de Streamlit), cambia el
+video seleccionado en cada una y reporta el RSS del proceso al agregar sesiones.
+
+Uso:
+    python benchmarks/memoria_sesiones.py --sesiones 50
+
+Para comparar antes/después, ejecutar el script en ambos commits.
+
+Resultados de referencia (50 sesiones, dos ejecuciones por commit):
+    antes (st.cache_data, baseline)         562 KB y 556 KB por sesión agregada
+    después (Arrow + st.cache_resource)     521 KB y 558 KB por sesión agregada
+Con los CSV actuales (unos pocos KB) la diferencia queda dentro del ruido: el
+costo por sesión lo domina el estado de Streamlit, no los datos. El ahorro del
+memory-map crece con el tamaño de Metadatos y de los conteos.
+"""
+import argparse
+import gc
+import os
+import sys
+
+import psutil
+from streamlit.testing.v1 import AppTest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGINA_REPORTE = os.path.join(RAIZ, "pages", "1_Reporte.py")
+
+
+def rss_mb():
+    """RSS actual del proceso en MB"""
+    gc.collect()
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+def abrir_sesion(indice):
+    """Ejecuta la página en una nueva sesión y selecciona un video según el índice"""
+    at = AppTest.from_file(PAGINA_REPORTE, default_timeout=60).run()
+    selector = at.sidebar.selectbox[0]
+    video = selector.options[indice % len(selector.options)]
+    selector.select(video).run()
+    return at
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sesiones", type=int, default=50, help="Número de sesiones a abrir")
+    args = parser.parse_args()
+
+    # Las rutas de la app son relativas a la raíz del repositorio
+    os.chdir(RAIZ)
+    sys.path.insert(0, RAIZ)
+
+    sesiones = [abrir_sesion(0)]
+    rss_inicial = rss_mb()
+    print(f"RSS con 1 sesión: {rss_inicial:.1f} MB")
+
+    for i in range(1, args.sesiones):
+        sesiones.append(abrir_sesion(i))
+        if (i + 1) % 10 == 0 or i + 1 == args.sesiones:
+            print(f"RSS con {i + 1} sesiones: {rss_mb():.1f} MB")
+
+    rss_final = rss_mb()
+    agregadas = max(len(sesiones) - 1, 1)
+    print(f"RSS por sesión agregada: {(rss_final - rss_inicial) / agregadas * 1024:.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Capa de datos compartida del sistema de aforo vehicular.
+
+Los CSV de la carpeta ``datos`` se convierten una sola vez a archivos Arrow IPC
+(Feather v2, sin compresión) dentro de ``datos/.arrow`` y se leen mediante
+memory-map. De esta forma todas las sesiones de Streamlit y todos los procesos
+del servidor leen las mismas páginas del caché del sistema operativo en lugar
+de mantener cada uno su propia copia de los datos.
+"""
+import os
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+CARPETA_DATOS = "datos"
+RUTA_METADATOS = os.path.join(CARPETA_DATOS, "Metadatos.csv")
+SUFIJO_CONTEOS = "_counts.csv"
+FORMATO_FECHA = '%d/%m/%Y %H:%M:%S'
+
+
+def ruta_arrow(ruta_csv):
+    """
+    Obtiene la ruta del archivo Arrow asociado a un CSV.
+
+    Args:
+        ruta_csv (str): Ruta del archivo CSV original
+
+    Returns:
+        str: Ruta del archivo .arrow dentro de la subcarpeta .arrow
+    """
+    carpeta, nombre = os.path.split(ruta_csv)
+    return os.path.join(carpeta, ".arrow", f"{nombre}.arrow")
+
+
+def _arrow_vigente(ruta_csv, destino):
+    """Indica si el archivo Arrow existe y es más reciente que su CSV."""
+    return os.path.exists(destino) and os.path.getmtime(destino) >= os.path.getmtime(ruta_csv)
+
+
+def materializar_arrow(ruta_csv, preparar=None):
+    """
+    Convierte un CSV a Arrow IPC sin compresión si aún no existe o está desactualizado.
+
+    La escritura se hace en un archivo temporal que luego se renombra, para que
+    varios procesos puedan materializar el mismo archivo al mismo tiempo sin
+    leer archivos a medio escribir.
+
+    Args:
+        ruta_csv (str): Ruta del archivo CSV
+        preparar (callable, opcional): Función que recibe y devuelve el DataFrame
+            leído del CSV antes de convertirlo
+
+    Returns:
+        str: Ruta del archivo Arrow listo para memory-map
+    """
+    destino = ruta_arrow(ruta_csv)
+    if _arrow_vigente(ruta_csv, destino):
+        return destino
+
+    df = pd.read_csv(ruta_csv)
+    if preparar is not None:
+        df = preparar(df)
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    # Nombre temporal único por llamada: varios hilos o procesos pueden
+    # materializar el mismo archivo a la vez sin pisarse
+    descriptor, temporal = tempfile.mkstemp(
+        dir=os.path.dirname(destino), prefix=f"{os.path.basename(destino)}.", suffix=".tmp"
+    )
+    os.close(descriptor)
+    try:
+        # mkstemp crea el archivo con permisos 0600; los demás procesos deben poder leerlo
+        os.chmod(temporal, 0o644)
+        feather.write_feather(tabla, temporal, compression="uncompressed")
+        os.replace(temporal, destino)
+    except OSError:
+        # En Windows no se puede reemplazar un archivo que otro proceso tiene
+        # mapeado; se conserva el existente hasta el siguiente reinicio.
+        if not os.path.exists(destino):
+            raise
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+    return destino
+
+
+def abrir_tabla(ruta_csv, preparar=None):
+    """
+    Abre la versión Arrow de un CSV mediante memory-map (sin copiar los datos).
+
+    Args:
+        ruta_csv (str): Ruta del archivo CSV
+        preparar (callable, opcional): Transformación aplicada al materializar
+
+    Returns:
+        pa.Table: Tabla de solo lectura respaldada por el archivo mapeado
+    """
+    return feather.read_table(materializar_arrow(ruta_csv, preparar), memory_map=True)
+
+
+def _preparar_conteos(df):
+    """Asegura que la columna count sea numérica"""
+    df['count'] = pd.to_numeric(df['count'], errors='coerce').fillna(0)
+    return df
+
+
+def tabla_metadatos(ruta_metadatos=RUTA_METADATOS):
+    """Tabla Arrow compartida con los metadatos de los videos"""
+    return abrir_tabla(ruta_metadatos)
+
+
+def tabla_conteos(ruta_conteos):
+    """Tabla Arrow compartida con los conteos de un video"""
+    return abrir_tabla(ruta_conteos, _preparar_conteos)
+
+
+def archivos_conteos(carpeta_datos=CARPETA_DATOS):
+    """Lista los archivos de conteos disponibles en la carpeta de datos"""
+    return [f for f in os.listdir(carpeta_datos) if f.endswith(SUFIJO_CONTEOS)]
+
+
+def resolver_archivo_conteos(nombre_video, carpeta_datos=CARPETA_DATOS):
+    """
+    Localiza el archivo de conteos de un video.
+
+    Intenta primero con el nombre exacto y, si no existe, busca coincidencias
+    flexibles (ignorando mayúsculas, espacios y la extensión del video).
+
+    Args:
+        nombre_video (str): Nombre del video tal como aparece en Metadatos.csv
+        carpeta_datos (str): Carpeta donde se encuentran los CSV de conteos
+
+    Returns:
+        tuple: (nombre_archivo, ruta_completa, aproximado) donde aproximado indica
+        si el archivo se encontró por coincidencia flexible
+    """
+    nombre_archivo = f"{nombre_video}{SUFIJO_CONTEOS}"
+    ruta_completa = os.path.join(carpeta_datos, nombre_archivo)
+    if os.path.exists(ruta_completa):
+        return nombre_archivo, ruta_completa, False
+
+    nombre_base = nombre_video.replace('.avi', '').replace('.mp4', '').strip().lower()
+    for archivo in archivos_conteos(carpeta_datos):
+        archivo_normalizado = archivo.replace(SUFIJO_CONTEOS, '').strip().lower()
+        if archivo_normalizado == nombre_base or nombre_base in archivo_normalizado:
+            return archivo, os.path.join(carpeta_datos, archivo), True
+
+    return nombre_archivo, ruta_completa, False
+
+
+def leer_metadatos(ruta_metadatos=RUTA_METADATOS):
+    """
+    Carga los metadatos de los videos sin depender de Streamlit.
+
+    Args:
+        ruta_metadatos (str): Ruta del archivo Metadatos.csv
+
+    Returns:
+        pd.DataFrame: Metadatos tal como vienen en el CSV
+    """
+    return tabla_metadatos(ruta_metadatos).to_pandas()
+
+
+def leer_conteos(nombre_video, carpeta_datos=CARPETA_DATOS):
+    """
+    Carga los conteos de un video sin depender de Streamlit.
+
+    Args:
+        nombre_video (str): Nombre del video tal como aparece en Metadatos.csv
+        carpeta_datos (str): Carpeta donde se encuentran los CSV de conteos
+
+    Returns:
+        pd.DataFrame: Conteos con columnas line_id, class y count
+
+    Raises:
+        FileNotFoundError: Si no existe un archivo de conteos para el video
+    """
+    _, ruta_completa, _ = resolver_archivo_conteos(nombre_video, carpeta_datos)
+    return tabla_conteos(ruta_completa).to_pandas()
+
+
+def procesar_conteos(df):
+    """Procesa el dataframe de conteos para análisis"""
+    # Filtrar datos por línea (solo líneas individuales, no ALL)
+    linea_1 = df[df['line_id'] == 1].copy()
+    linea_2 = df[df['line_id'] == 2].copy()
+    
+    # Crear resumen total combinando línea 1 y 2
+    todos = pd.concat([linea_1, linea_2]).groupby('class', as_index=False)['count'].sum()
+    todos['line_id'] = 'ALL'
+    
+    return linea_1, linea_2, todos
+
+
+def parse_coordinates(coord_string):
+    """
+    Extrae latitud y longitud de una cadena de coordenadas.
+    
+    Args:
+        coord_string (str): Cadena con formato "latitud, longitud"
+        
+    Returns:
+        tuple: (latitud, longitud) o (None, None) si hay error
+    """
+    try:
+        parts = coord_string.split(',')
+        lat = float(parts[0].strip())
+        lon = float(parts[1].strip())
+        return lat, lon
+    except:
+        return None, None
+
+
+def agregar_ubicacion_y_fechas(df):
+    """
+    Agrega columnas derivadas de los metadatos para filtrar por zona y periodo.
+
+    Args:
+        df (pd.DataFrame): Metadatos con columnas Coordenadas, Fecha_inicio y
+            Fecha_fin (si falta alguna, sus columnas derivadas quedan vacías)
+
+    Returns:
+        pd.DataFrame: Copia con columnas latitud, longitud, inicio y fin
+    """
+    df = df.copy()
+    if 'Coordenadas' in df.columns:
+        coordenadas = df['Coordenadas'].map(parse_coordinates)
+        df['latitud'] = pd.to_numeric(coordenadas.str[0], errors='coerce')
+        df['longitud'] = pd.to_numeric(coordenadas.str[1], errors='coerce')
+    else:
+        df['latitud'] = float('nan')
+        df['longitud'] = float('nan')
+    for columna, derivada in (('Fecha_inicio', 'inicio'), ('Fecha_fin', 'fin')):
+        if columna in df.columns:
+            df[derivada] = pd.to_datetime(df[columna], format=FORMATO_FECHA, errors='coerce')
+        else:
+            df[derivada] = pd.NaT
+    return df
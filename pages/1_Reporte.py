@@ -4,6 +4,11 @@ import plotly.express as px
 import plotly.graph_objects as go
 from pathlib import Path
 import os
+import sqlite3
+
+import datos_aforo
+import sql_aforo
+from precarga import Precargador
 
 # Configuración de la página
 st.set_page_config(page_title="Reporte de Aforo Vehicular", page_icon="�", layout="wide")
@@ -12,13 +17,27 @@ st.set_page_config(page_title="Reporte de Aforo Vehicular", page_icon="�", lay
 st.title("Reporte de Aforo Vehicular")
 st.markdown("### Resultados del Modelo de Visión Computacional")
 
+# Tablas Arrow compartidas por todas las sesiones del proceso. Los archivos se
+# abren con memory-map, por lo que los demás procesos del servidor leen las
+# mismas páginas en memoria en lugar de duplicar los datos.
+@st.cache_resource
+def _tabla_metadatos(ruta_metadatos):
+    return datos_aforo.tabla_metadatos(ruta_metadatos)
+
+@st.cache_resource
+def _tabla_conteos(ruta_conteos):
+    return datos_aforo.tabla_conteos(ruta_conteos)
+
+# Caché LRU de conteos procesados con precarga en segundo plano (uno por proceso)
+@st.cache_resource
+def _precargador():
+    return Precargador()
+
 # Función para cargar metadatos
-@st.cache_data
 def cargar_metadatos(ruta_metadatos="datos/Metadatos.csv"):
     """Carga el archivo de metadatos con información de los videos"""
     try:
-        df = pd.read_csv(ruta_metadatos)
-        return df
+        return _tabla_metadatos(ruta_metadatos).to_pandas()
     except FileNotFoundError:
         st.error(f"No se encontró el archivo de metadatos en: {ruta_metadatos}")
         return None
@@ -27,59 +46,32 @@ def cargar_metadatos(ruta_metadatos="datos/Metadatos.csv"):
         return None
 
 # Función para cargar conteos de un video
-@st.cache_data
 def cargar_conteos(nombre_video, carpeta_datos="datos"):
-    """Carga el archivo CSV con los conteos de un video específico"""
-    # Intentar primero con el nombre exacto
-    nombre_archivo = f"{nombre_video}_counts.csv"
-    ruta_completa = os.path.join(carpeta_datos, nombre_archivo)
-    
-    # Si el archivo no existe, buscar archivos similares
-    if not os.path.exists(ruta_completa):
-        # Buscar archivos CSV que contengan el nombre base (sin extensión)
-        nombre_base = nombre_video.replace('.avi', '').replace('.mp4', '').strip().lower()
-        archivos_disponibles = [f for f in os.listdir(carpeta_datos) if f.endswith('_counts.csv')]
-        
-        # Buscar coincidencias flexibles (ignorando mayúsculas y espacios)
-        for archivo in archivos_disponibles:
-            archivo_normalizado = archivo.replace('_counts.csv', '').strip().lower()
-            if archivo_normalizado == nombre_base or nombre_base in archivo_normalizado:
-                nombre_archivo = archivo
-                ruta_completa = os.path.join(carpeta_datos, nombre_archivo)
-                st.info(f"Archivo encontrado: {nombre_archivo}")
-                break
+    """
+    Carga el archivo CSV con los conteos de un video específico.
+
+    Returns:
+        tuple: (df, nombre_archivo, aproximado); df es None si no se pudo cargar
+    """
+    # Buscar el archivo por nombre exacto o por coincidencia flexible
+    nombre_archivo, ruta_completa, aproximado = datos_aforo.resolver_archivo_conteos(
+        nombre_video, carpeta_datos
+    )
     
     try:
-        df = pd.read_csv(ruta_completa)
-        # Asegurar que la columna count sea numérica
-        df['count'] = pd.to_numeric(df['count'], errors='coerce').fillna(0)
-        return df
+        return _tabla_conteos(ruta_completa).to_pandas(), nombre_archivo, aproximado
     except FileNotFoundError:
         st.error(f"No se encontró el archivo: {nombre_archivo}")
         st.warning("Archivos disponibles en la carpeta datos:")
         try:
-            archivos = [f for f in os.listdir(carpeta_datos) if f.endswith('_counts.csv')]
-            for archivo in archivos:
+            for archivo in datos_aforo.archivos_conteos(carpeta_datos):
                 st.write(f"  • {archivo}")
         except:
             pass
-        return None
+        return None, nombre_archivo, aproximado
     except Exception as e:
         st.error(f"Error al cargar {nombre_archivo}: {e}")
-        return None
-
-# Función para procesar datos de conteo
-def procesar_conteos(df):
-    """Procesa el dataframe de conteos para análisis"""
-    # Filtrar datos por línea (solo líneas individuales, no ALL)
-    linea_1 = df[df['line_id'] == 1].copy()
-    linea_2 = df[df['line_id'] == 2].copy()
-    
-    # Crear resumen total combinando línea 1 y 2
-    todos = pd.concat([linea_1, linea_2]).groupby('class', as_index=False)['count'].sum()
-    todos['line_id'] = 'ALL'
-    
-    return linea_1, linea_2, todos
+        return None, nombre_archivo, aproximado
 
 # Función auxiliar para obtener conteo de una clase
 def obtener_conteo(df, clase):
@@ -116,20 +108,55 @@ if df_metadatos is not None:
         index=0
     )
     
-    # Mostrar información del video seleccionado
-    info_video = df_metadatos[df_metadatos[columna_video] == video_seleccionado].iloc[0]
+    # Mostrar información del video seleccionado (búsqueda por llave en SQLite)
+    try:
+        info_video = sql_aforo.info_video(video_seleccionado, sql_aforo.base_del_proceso())
+    except (sqlite3.Error, OSError, ValueError):
+        # Sin base SQLite se busca directamente en los metadatos cargados
+        info_video = None
+    if info_video is None:
+        info_video = df_metadatos[df_metadatos[columna_video] == video_seleccionado].iloc[0]
     
     with st.sidebar.expander("Información del Video", expanded=True):
-        for col in df_metadatos.columns:
+        for col in info_video.index:
             if col != columna_video:
                 st.write(f"**{col}:** {info_video[col]}")
     
-    # Cargar conteos del video seleccionado
-    df_conteos = cargar_conteos(video_seleccionado)
+    # Conteos procesados del video seleccionado: primero desde el caché de
+    # precarga y, si no están, se cargan y se guardan para la próxima vez.
+    # Solo cuenta en las estadísticas cuando la sesión cambia de video, no en
+    # cada re-ejecución de la página (por ejemplo, al mover un widget).
+    precargador = _precargador()
+    video_nuevo = st.session_state.get('video_precarga') != video_seleccionado
+    st.session_state['video_precarga'] = video_seleccionado
+    conteos_procesados = None
+    entrada = precargador.obtener(video_seleccionado, contar=video_nuevo)
+    if entrada is not None:
+        conteos_procesados, nombre_archivo, aproximado = entrada
+    else:
+        df_conteos, nombre_archivo, aproximado = cargar_conteos(video_seleccionado)
+        if df_conteos is not None:
+            conteos_procesados = datos_aforo.procesar_conteos(df_conteos)
+            precargador.guardar(video_seleccionado, conteos_procesados, nombre_archivo, aproximado)
+    if conteos_procesados is not None and aproximado:
+        st.info(f"Archivo encontrado: {nombre_archivo}")
     
-    if df_conteos is not None:
-        # Procesar conteos
-        linea_1, linea_2, todos = procesar_conteos(df_conteos)
+    # Precargar en segundo plano los videos vecinos y los del mismo sitio o franja horaria
+    precargador.precargar_relacionados(df_metadatos, video_seleccionado, columna_video)
+    
+    with st.sidebar.expander("Estadísticas de Precarga", expanded=False):
+        estadisticas = precargador.estadisticas()
+        st.write(f"**Tasa de aciertos:** {estadisticas['tasa_aciertos']:.0%} "
+                 f"({estadisticas['aciertos']} de {estadisticas['aciertos'] + estadisticas['fallos']} "
+                 f"selecciones; {estadisticas['aciertos_precarga']} por precarga)")
+        st.write(f"**Videos en caché:** {estadisticas['entradas']}")
+        st.write(f"**Memoria:** {estadisticas['memoria_bytes'] / 1024:,.0f} KB de "
+                 f"{estadisticas['memoria_maxima_bytes'] / 1024:,.0f} KB")
+        st.write(f"**Precargados / expulsados:** {estadisticas['precargados']} / {estadisticas['expulsados']}")
+    
+    if conteos_procesados is not None:
+        # Los DataFrames del caché se comparten entre sesiones: no modificarlos
+        linea_1, linea_2, todos = conteos_procesados
         
         # Tabs para organizar la información
         tab1, tab2, tab3, tab4 = st.tabs([
@@ -544,6 +571,37 @@ if df_metadatos is not None:
                     mime="text/csv"
                 )
 
+    # Consulta avanzada sobre la base SQLite (solo lectura)
+    st.divider()
+    with st.expander("Consulta Avanzada (SQL)"):
+        st.markdown(
+            "Tablas disponibles: `videos` (columnas de Metadatos.csv más `latitud`, `longitud`, "
+            "`inicio` y `fin` en formato `AAAA-MM-DD HH:MM:SS`) y "
+            "`conteos` (`video`, `line_id`, `\"class\"`, `\"count\"`). "
+            "`conteos` solo incluye videos cuyo archivo de conteos coincide exactamente con su nombre; "
+            "`archivos_conteos` (`video`, `archivo`, `aproximado`) indica qué archivo corresponde a cada video."
+        )
+        consulta_ejemplo = st.selectbox("Consulta de ejemplo:", list(sql_aforo.CONSULTAS_EJEMPLO))
+        consulta_sql = st.text_area(
+            "Consulta SQL:",
+            value=sql_aforo.CONSULTAS_EJEMPLO[consulta_ejemplo],
+            height=120
+        )
+        if st.button("Ejecutar consulta"):
+            try:
+                resultado = sql_aforo.consultar(
+                    consulta_sql, ruta_bd=sql_aforo.base_del_proceso(), tiempo_maximo=10, de_usuario=True
+                )
+                st.dataframe(resultado, use_container_width=True)
+                st.download_button(
+                    label="Descargar resultado",
+                    data=resultado.to_csv(index=False).encode('utf-8'),
+                    file_name="consulta_aforo.csv",
+                    mime="text/csv"
+                )
+            except Exception as e:
+                st.error(f"Error en la consulta: {e}")
+
 else:
     st.error("No se pudo cargar el archivo de metadatos. Verifica la ruta 'datos/Metadatos.csv'")
 
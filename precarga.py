@@ -0,0 +1,192 @@
+"""
+Precarga en segundo plano de los videos que probablemente se seleccionen después.
+
+Cuando el usuario elige un video en el reporte, se cargan y procesan en un pool
+de hilos los videos vecinos en la lista del selector y los del mismo sitio o la
+misma franja horaria. Los resultados de ``procesar_conteos`` se guardan en un
+caché LRU acotado por número de entradas y por memoria, compartido por todas
+las sesiones del proceso, de modo que la siguiente selección se resuelve desde
+memoria.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from datos_aforo import CARPETA_DATOS, procesar_conteos, resolver_archivo_conteos, tabla_conteos
+
+MEMORIA_MAXIMA = 64 * 1024 * 1024
+ENTRADAS_MAXIMAS = 256
+
+
+def _tamano(resultado):
+    """Memoria en bytes de los DataFrames devueltos por procesar_conteos"""
+    return int(sum(df.memory_usage(deep=True).sum() for df in resultado))
+
+
+def videos_relacionados(metadatos, nombre_video, columna_video='Nombre_archivo', vecinos=2, maximo=8):
+    """
+    Obtiene los videos que probablemente se seleccionen después de nombre_video.
+
+    Se priorizan los vecinos inmediatos en el orden de la lista, luego los
+    videos del mismo sitio (mismas coordenadas) y por último los de la misma
+    franja horaria (misma fecha y hora de inicio).
+
+    Args:
+        metadatos (pd.DataFrame): Metadatos de los videos en el orden del selector
+        nombre_video (str): Video seleccionado actualmente
+        columna_video (str): Columna con los nombres de los videos
+        vecinos (int): Cuántos videos antes y después en la lista se consideran
+        maximo (int): Número máximo de videos a devolver
+
+    Returns:
+        list: Nombres de videos relacionados, sin repetir y sin nombre_video
+    """
+    nombres = metadatos[columna_video].tolist()
+    if nombre_video not in nombres:
+        return []
+    posicion = nombres.index(nombre_video)
+    fila = metadatos.iloc[posicion]
+
+    candidatos = []
+    for distancia in range(1, vecinos + 1):
+        for indice in (posicion + distancia, posicion - distancia):
+            if 0 <= indice < len(nombres):
+                candidatos.append(nombres[indice])
+
+    if 'Coordenadas' in metadatos.columns:
+        mismo_sitio = metadatos[metadatos['Coordenadas'] == fila['Coordenadas']]
+        candidatos.extend(mismo_sitio[columna_video])
+
+    if 'Fecha_inicio' in metadatos.columns:
+        # "30/06/2025 7:00:00" -> "30/06/2025 7": misma fecha y hora de inicio
+        franja = metadatos['Fecha_inicio'].astype(str).str.split(':').str[0]
+        misma_franja = metadatos[franja == str(fila['Fecha_inicio']).split(':')[0]]
+        candidatos.extend(misma_franja[columna_video])
+
+    relacionados = []
+    for candidato in candidatos:
+        if candidato != nombre_video and candidato not in relacionados:
+            relacionados.append(candidato)
+    return relacionados[:maximo]
+
+
+class Precargador:
+    """
+    Caché LRU de conteos procesados con precarga en un pool de hilos.
+
+    Cada entrada guarda el resultado de ``procesar_conteos`` junto con el nombre
+    del archivo de conteos y si se encontró por coincidencia aproximada, para
+    que la página pueda avisarlo también cuando el video sale del caché.
+    Los DataFrames guardados se comparten entre sesiones y no deben modificarse.
+    """
+
+    def __init__(self, carpeta_datos=CARPETA_DATOS, memoria_maxima=MEMORIA_MAXIMA,
+                 entradas_maximas=ENTRADAS_MAXIMAS, hilos=2):
+        self.carpeta_datos = carpeta_datos
+        self.memoria_maxima = memoria_maxima
+        self.entradas_maximas = entradas_maximas
+        self._cache = OrderedDict()
+        self._pendientes = set()
+        self._candado = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="precarga")
+        self._memoria = 0
+        self._aciertos = 0
+        self._aciertos_precarga = 0
+        self._fallos = 0
+        self._precargados = 0
+        self._expulsados = 0
+
+    def obtener(self, nombre_video, contar=True):
+        """
+        Busca en memoria los conteos procesados de un video.
+
+        Args:
+            nombre_video (str): Video seleccionado
+            contar (bool): Si la consulta cuenta en las estadísticas. La página lo
+                desactiva en las re-ejecuciones que no cambian de video, para que
+                la tasa de aciertos refleje solo selecciones nuevas.
+
+        Returns:
+            tuple: ((linea_1, linea_2, todos), nombre_archivo, aproximado) o None
+                si el video no está en caché
+        """
+        with self._candado:
+            entrada = self._cache.get(nombre_video)
+            if entrada is None:
+                if contar:
+                    self._fallos += 1
+                return None
+            self._cache.move_to_end(nombre_video)
+            resultado, nombre_archivo, aproximado, _, precargado = entrada
+            if contar:
+                self._aciertos += 1
+                if precargado:
+                    self._aciertos_precarga += 1
+            return resultado, nombre_archivo, aproximado
+
+    def guardar(self, nombre_video, resultado, nombre_archivo, aproximado=False, precargado=False):
+        """Guarda el resultado de procesar_conteos respetando los límites del caché"""
+        tamano = _tamano(resultado)
+        if tamano > self.memoria_maxima:
+            return
+        with self._candado:
+            anterior = self._cache.pop(nombre_video, None)
+            if anterior is not None:
+                self._memoria -= anterior[3]
+            self._cache[nombre_video] = (resultado, nombre_archivo, aproximado, tamano, precargado)
+            self._memoria += tamano
+            while self._memoria > self.memoria_maxima or len(self._cache) > self.entradas_maximas:
+                _, expulsado = self._cache.popitem(last=False)
+                self._memoria -= expulsado[3]
+                self._expulsados += 1
+
+    def _cargar(self, nombre_video):
+        try:
+            nombre_archivo, ruta_completa, aproximado = resolver_archivo_conteos(nombre_video, self.carpeta_datos)
+            resultado = procesar_conteos(tabla_conteos(ruta_completa).to_pandas())
+            self.guardar(nombre_video, resultado, nombre_archivo, aproximado, precargado=True)
+            with self._candado:
+                self._precargados += 1
+        except Exception:
+            # Un video sin conteos no debe afectar a la sesión que pidió la precarga
+            pass
+        finally:
+            with self._candado:
+                self._pendientes.discard(nombre_video)
+
+    def precargar(self, nombres_videos):
+        """Programa la carga en segundo plano de los videos que aún no están en caché"""
+        for nombre_video in nombres_videos:
+            with self._candado:
+                if nombre_video in self._cache or nombre_video in self._pendientes:
+                    continue
+                self._pendientes.add(nombre_video)
+            self._pool.submit(self._cargar, nombre_video)
+
+    def precargar_relacionados(self, metadatos, nombre_video, columna_video='Nombre_archivo'):
+        """Calcula en segundo plano los videos relacionados con nombre_video y los precarga"""
+        metadatos = metadatos[[c for c in (columna_video, 'Coordenadas', 'Fecha_inicio') if c in metadatos.columns]]
+        self._pool.submit(
+            lambda: self.precargar(videos_relacionados(metadatos, nombre_video, columna_video))
+        )
+
+    def estadisticas(self):
+        """
+        Aciertos, fallos, tasa de aciertos y uso de memoria del caché.
+
+        ``aciertos_precarga`` cuenta los aciertos sobre entradas cargadas en
+        segundo plano; el resto son videos que la app ya había cargado antes.
+        """
+        with self._candado:
+            consultas = self._aciertos + self._fallos
+            return {
+                'aciertos': self._aciertos,
+                'aciertos_precarga': self._aciertos_precarga,
+                'fallos': self._fallos,
+                'tasa_aciertos': self._aciertos / consultas if consultas else 0.0,
+                'precargados': self._precargados,
+                'expulsados': self._expulsados,
+                'entradas': len(self._cache),
+                'memoria_bytes': self._memoria,
+                'memoria_maxima_bytes': self.memoria_maxima,
+            }
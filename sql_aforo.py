@@ -0,0 +1,386 @@
+"""
+Base SQLite embebida con los metadatos y todos los conteos de aforo.
+
+La base se genera a partir de los CSV de la carpeta ``datos`` (y se regenera
+cuando alguno cambia) en ``datos/aforo.sqlite``. Tiene índices por nombre de
+video, fecha, línea y clase, de modo que las búsquedas puntuales y las
+agregaciones se resuelven con consultas indexadas en lugar de recorrer
+DataFrames completos.
+
+Las conexiones son de solo lectura y se reutilizan mediante un pool por proceso
+(ver ``conexion``).
+"""
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from datos_aforo import (
+    CARPETA_DATOS,
+    RUTA_METADATOS,
+    agregar_ubicacion_y_fechas,
+    leer_metadatos,
+    procesar_conteos,
+    resolver_archivo_conteos,
+    tabla_conteos,
+)
+
+RUTA_BD = os.path.join(CARPETA_DATOS, "aforo.sqlite")
+FORMATO_ISO = '%Y-%m-%d %H:%M:%S'
+
+ESQUEMA = """
+CREATE TABLE conteos (
+    video TEXT NOT NULL,
+    line_id INTEGER NOT NULL,
+    "class" TEXT NOT NULL,
+    "count" INTEGER NOT NULL
+);
+CREATE TABLE archivos_conteos (
+    video TEXT PRIMARY KEY,
+    archivo TEXT NOT NULL,
+    aproximado INTEGER NOT NULL
+);
+CREATE INDEX idx_conteos_video ON conteos (video, line_id, "class", "count");
+CREATE INDEX idx_conteos_linea ON conteos (line_id, "class", "count");
+CREATE INDEX idx_conteos_clase ON conteos ("class", video, "count");
+"""
+
+# La tabla videos tiene las columnas de Metadatos.csv tal como vienen en el
+# archivo más estas columnas derivadas para filtrar por zona y periodo
+COLUMNA_VIDEO = 'Nombre_archivo'
+COLUMNAS_DERIVADAS = {'latitud': 'REAL', 'longitud': 'REAL', 'inicio': 'TEXT', 'fin': 'TEXT'}
+
+# Consultas de ejemplo para el panel de consulta avanzada
+CONSULTAS_EJEMPLO = {
+    "Totales por clase (todos los videos)": (
+        'SELECT "class", SUM("count") AS total FROM conteos '
+        'GROUP BY "class" ORDER BY total DESC'
+    ),
+    "Totales por línea y clase": (
+        'SELECT line_id, "class", SUM("count") AS total FROM conteos '
+        'GROUP BY line_id, "class" ORDER BY line_id, total DESC'
+    ),
+    "Total por video": (
+        'SELECT v.Nombre_archivo, v.Fecha_inicio, SUM(c."count") AS total '
+        'FROM videos v JOIN conteos c ON c.video = v.Nombre_archivo '
+        'GROUP BY v.Nombre_archivo ORDER BY total DESC'
+    ),
+    "Autos por video en un periodo": (
+        "SELECT c.video, SUM(c.\"count\") AS autos FROM videos v "
+        "JOIN conteos c ON c.video = v.Nombre_archivo "
+        "WHERE v.inicio >= '2025-06-30 00:00:00' AND v.fin <= '2025-06-30 23:59:59' "
+        "AND c.\"class\" = 'car' GROUP BY c.video ORDER BY autos DESC"
+    ),
+}
+
+
+def _identificador(nombre):
+    """Nombre de columna entre comillas dobles para usarlo en SQL"""
+    return '"' + str(nombre).replace('"', '""') + '"'
+
+
+def _tipo_sql(serie):
+    """Tipo de columna SQLite según el dtype de pandas"""
+    if pd.api.types.is_bool_dtype(serie) or pd.api.types.is_integer_dtype(serie):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(serie):
+        return 'REAL'
+    return 'TEXT'
+
+
+def _validar_metadatos(metadatos):
+    if COLUMNA_VIDEO not in metadatos.columns:
+        raise ValueError(
+            f"Metadatos.csv no tiene la columna {COLUMNA_VIDEO}; "
+            f"columnas disponibles: {', '.join(map(str, metadatos.columns))}"
+        )
+
+
+def _esquema_videos(videos):
+    """CREATE TABLE de videos con las columnas del DataFrame y sus índices"""
+    definiciones = []
+    for columna in videos.columns:
+        if columna == COLUMNA_VIDEO:
+            tipo = 'TEXT PRIMARY KEY'
+        else:
+            tipo = COLUMNAS_DERIVADAS.get(columna) or _tipo_sql(videos[columna])
+        definiciones.append(f"    {_identificador(columna)} {tipo}")
+    return (
+        "CREATE TABLE videos (\n" + ",\n".join(definiciones) + "\n);\n"
+        "CREATE INDEX idx_videos_inicio ON videos (inicio);\n"
+        "CREATE INDEX idx_videos_fin ON videos (fin);\n"
+    )
+
+
+def construir_base(ruta_bd, metadatos, conteos, archivos=None):
+    """
+    Crea la base SQLite a partir de DataFrames ya cargados.
+
+    La base se escribe en un archivo temporal y se renombra al terminar, para
+    que otros procesos nunca abran una base a medio construir.
+
+    Args:
+        ruta_bd (str): Ruta del archivo SQLite a generar
+        metadatos (pd.DataFrame): Metadatos tal como vienen en Metadatos.csv;
+            todas sus columnas pasan a la tabla videos
+        conteos (pd.DataFrame): Conteos con columnas video, line_id, class y count
+        archivos (pd.DataFrame, opcional): Archivo de conteos de cada video, con
+            columnas video, archivo y aproximado
+
+    Raises:
+        ValueError: Si los metadatos no tienen la columna Nombre_archivo
+    """
+    _validar_metadatos(metadatos)
+    videos = agregar_ubicacion_y_fechas(metadatos)
+    videos['inicio'] = videos['inicio'].dt.strftime(FORMATO_ISO)
+    videos['fin'] = videos['fin'].dt.strftime(FORMATO_ISO)
+    videos = videos.drop_duplicates(subset=COLUMNA_VIDEO)
+
+    # Nombre temporal único por llamada para que dos construcciones simultáneas
+    # (hilos o procesos) no escriban el mismo archivo
+    descriptor, temporal = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(ruta_bd)),
+        prefix=f"{os.path.basename(ruta_bd)}.",
+        suffix=".tmp",
+    )
+    os.close(descriptor)
+    os.chmod(temporal, 0o644)
+    con = sqlite3.connect(temporal)
+    try:
+        con.executescript(ESQUEMA + _esquema_videos(videos))
+        videos = videos.astype(object).where(videos.notna(), None)
+        con.executemany(
+            f"INSERT INTO videos VALUES ({', '.join('?' * len(videos.columns))})",
+            videos.itertuples(index=False, name=None),
+        )
+        con.executemany(
+            'INSERT INTO conteos (video, line_id, "class", "count") VALUES (?, ?, ?, ?)',
+            conteos[['video', 'line_id', 'class', 'count']]
+            .astype({'line_id': int, 'count': int})
+            .itertuples(index=False, name=None),
+        )
+        if archivos is not None:
+            con.executemany(
+                'INSERT INTO archivos_conteos (video, archivo, aproximado) VALUES (?, ?, ?)',
+                archivos[['video', 'archivo', 'aproximado']]
+                .astype({'aproximado': int})
+                .itertuples(index=False, name=None),
+            )
+        con.commit()
+        con.execute("ANALYZE")
+        con.close()
+        os.replace(temporal, ruta_bd)
+    finally:
+        con.close()
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+def _conteos_desde_csv(metadatos, carpeta_datos):
+    """
+    Conteos de las líneas 1 y 2 de los videos con archivo de conteos propio.
+
+    Solo se cargan las coincidencias exactas de nombre: una coincidencia
+    flexible puede apuntar al archivo de otro video y duplicaría sus conteos en
+    las agregaciones. Todas las resoluciones (exactas y aproximadas) se
+    devuelven aparte para la tabla archivos_conteos.
+
+    Returns:
+        tuple: (conteos, archivos) como DataFrames
+    """
+    partes = []
+    archivos = []
+    for video in metadatos['Nombre_archivo']:
+        nombre_archivo, ruta_completa, aproximado = resolver_archivo_conteos(video, carpeta_datos)
+        if not os.path.exists(ruta_completa):
+            continue
+        archivos.append((video, nombre_archivo, aproximado))
+        if aproximado:
+            continue
+        linea_1, linea_2, _ = procesar_conteos(tabla_conteos(ruta_completa).to_pandas())
+        partes.append(pd.concat([linea_1, linea_2]).assign(video=video))
+    archivos = pd.DataFrame(archivos, columns=['video', 'archivo', 'aproximado'])
+    if not partes:
+        return pd.DataFrame(columns=['video', 'line_id', 'class', 'count']), archivos
+    return pd.concat(partes, ignore_index=True), archivos
+
+
+def _base_vigente(ruta_bd, carpeta_datos):
+    """Indica si la base existe y es más reciente que todos los CSV de datos"""
+    if not os.path.exists(ruta_bd):
+        return False
+    mtime_bd = os.path.getmtime(ruta_bd)
+    fuentes = [f for f in os.listdir(carpeta_datos) if f.endswith('.csv')]
+    return all(os.path.getmtime(os.path.join(carpeta_datos, f)) <= mtime_bd for f in fuentes)
+
+
+_candado_base = threading.RLock()
+_bases_del_proceso = set()
+
+
+def actualizar_base(carpeta_datos=CARPETA_DATOS, ruta_bd=RUTA_BD):
+    """
+    Genera la base desde los CSV si no existe o si algún CSV es más reciente.
+
+    Las llamadas concurrentes dentro del proceso se serializan, de modo que la
+    base se construye una sola vez aunque varias sesiones la pidan a la vez.
+
+    Args:
+        carpeta_datos (str): Carpeta con Metadatos.csv y los archivos de conteos
+        ruta_bd (str): Ruta del archivo SQLite
+
+    Returns:
+        str: Ruta de la base lista para consultar
+    """
+    with _candado_base:
+        if not _base_vigente(ruta_bd, carpeta_datos):
+            cerrar_conexiones()
+            ruta_metadatos = os.path.join(carpeta_datos, os.path.basename(RUTA_METADATOS))
+            metadatos = leer_metadatos(ruta_metadatos)
+            _validar_metadatos(metadatos)
+            conteos, archivos = _conteos_desde_csv(metadatos, carpeta_datos)
+            construir_base(ruta_bd, metadatos, conteos, archivos)
+    return ruta_bd
+
+
+def base_del_proceso(carpeta_datos=CARPETA_DATOS, ruta_bd=RUTA_BD):
+    """
+    Acceso compartido a la base para todas las páginas de la app.
+
+    La primera llamada del proceso verifica (y si hace falta genera) la base; las
+    siguientes solo devuelven la ruta, sin revisar los CSV en disco.
+
+    Returns:
+        str: Ruta de la base lista para consultar
+    """
+    clave = (carpeta_datos, ruta_bd)
+    with _candado_base:
+        if clave not in _bases_del_proceso:
+            actualizar_base(carpeta_datos, ruta_bd)
+            _bases_del_proceso.add(clave)
+    return ruta_bd
+
+
+_pools = {}
+_candado_pools = threading.Lock()
+
+
+def _abrir(ruta_bd):
+    """Abre una conexión de solo lectura que puede pasar entre hilos"""
+    con = sqlite3.connect(f"file:{ruta_bd}?mode=ro", uri=True, check_same_thread=False)
+    con.execute("PRAGMA query_only = ON")
+    return con
+
+
+@contextmanager
+def conexion(ruta_bd=RUTA_BD):
+    """
+    Presta una conexión del pool del proceso y la devuelve al terminar.
+
+    Streamlit ejecuta cada rerun en un hilo distinto, por lo que las conexiones
+    no se atan a un hilo: se toman del pool mientras dura la consulta.
+
+    Args:
+        ruta_bd (str): Ruta del archivo SQLite
+    """
+    with _candado_pools:
+        pool = _pools.setdefault(ruta_bd, queue.LifoQueue())
+    try:
+        con = pool.get_nowait()
+    except queue.Empty:
+        con = _abrir(ruta_bd)
+    try:
+        yield con
+    finally:
+        pool.put(con)
+
+
+def cerrar_conexiones():
+    """Cierra las conexiones del pool (por ejemplo, antes de regenerar la base)"""
+    with _candado_pools:
+        for pool in _pools.values():
+            while not pool.empty():
+                pool.get_nowait().close()
+        _pools.clear()
+
+
+# Acciones permitidas en consultas escritas por el usuario: solo lectura de
+# tablas y funciones. ATTACH, DETACH y PRAGMA quedan fuera porque su efecto
+# persistiría en la conexión del pool y alcanzaría a las siguientes consultas.
+_ACCIONES_USUARIO = {
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    sqlite3.SQLITE_RECURSIVE,
+}
+
+
+def _autorizar_usuario(accion, *_):
+    return sqlite3.SQLITE_OK if accion in _ACCIONES_USUARIO else sqlite3.SQLITE_DENY
+
+
+def consultar(sql, parametros=(), ruta_bd=RUTA_BD, tiempo_maximo=None, de_usuario=False):
+    """
+    Ejecuta una consulta de solo lectura y devuelve el resultado como DataFrame.
+
+    Args:
+        sql (str): Consulta SQL (se permiten parámetros con ?)
+        parametros (tuple): Valores para los parámetros de la consulta
+        ruta_bd (str): Ruta del archivo SQLite
+        tiempo_maximo (float, opcional): Segundos tras los cuales se interrumpe
+            la consulta con sqlite3.OperationalError
+        de_usuario (bool): Si la consulta la escribió el usuario, se rechaza con
+            "not authorized" todo lo que no sea lectura (ATTACH, PRAGMA, ...)
+
+    Returns:
+        pd.DataFrame: Resultado de la consulta
+    """
+    with conexion(ruta_bd) as con:
+        if tiempo_maximo is not None:
+            limite = time.monotonic() + tiempo_maximo
+            con.set_progress_handler(lambda: time.monotonic() > limite, 10000)
+        if de_usuario:
+            con.set_authorizer(_autorizar_usuario)
+        try:
+            return pd.read_sql_query(sql, con, params=parametros)
+        finally:
+            con.set_progress_handler(None, 0)
+            if de_usuario:
+                con.set_authorizer(None)
+
+
+def info_video(nombre_video, ruta_bd=RUTA_BD):
+    """Fila de Metadatos.csv de un video (búsqueda por llave primaria) o None"""
+    df = consultar("SELECT * FROM videos WHERE Nombre_archivo = ?", (nombre_video,), ruta_bd)
+    if len(df) == 0:
+        return None
+    return df.drop(columns=list(COLUMNAS_DERIVADAS)).iloc[0]
+
+
+def conteos_video(nombre_video, ruta_bd=RUTA_BD):
+    """Conteos por línea y clase de un video (consulta sobre idx_conteos_video)"""
+    return consultar(
+        'SELECT line_id, "class", "count" FROM conteos WHERE video = ? ORDER BY rowid',
+        (nombre_video,),
+        ruta_bd,
+    )
+
+
+def resumen_periodo(ruta_bd=RUTA_BD):
+    """
+    Número de videos con ubicación válida y su periodo de análisis.
+
+    Returns:
+        pd.Series: total, inicio (fecha mínima) y fin (fecha máxima); las fechas
+        son None si ningún video tiene fechas válidas
+    """
+    return consultar(
+        "SELECT COUNT(Duracion_video) AS total, MIN(inicio) AS inicio, MAX(fin) AS fin "
+        "FROM videos WHERE latitud IS NOT NULL AND longitud IS NOT NULL",
+        ruta_bd=ruta_bd,
+    ).iloc[0]